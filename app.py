@@ -2,17 +2,27 @@
 # Streamlit App: Multi-Laminate Cutting Optimizer
 
 import streamlit as st
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import PolyCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.text import Text
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
-from rectpack import newPacker
-import tempfile
+from reportlab.lib import colors
+from reportlab.lib.colors import HexColor
+from reportlab.graphics.shapes import Drawing, Group, Rect, String
+from packer import Rects, pack_guillotine, pack_maxrects, tile_sheets
+from panels import parse_panels
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import numpy as np
 import os
-import base64
-import re
+import io
+import pandas as pd
 
 # === Streamlit Config ===
 st.set_page_config(layout="wide")
@@ -25,10 +35,221 @@ standard_sizes = {
     "6x3 ft (1830x1830)": (1830, 1830)
 }
 
+# Sheet preview resolution; HIGH_RES=1 renders them at print quality
+PREVIEW_DPI = 180 if os.environ.get("HIGH_RES") == "1" else 110
+
 styles = getSampleStyleSheet()
+# Heading3 is already bold (Helvetica-BoldOblique), so sheet titles need no <b> markup
+h3, normal = styles["Heading3"], styles["Normal"]
+
+
+# === Packing ===
+MAX_BINS = 100
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def pack_panels(sheet_w, sheet_h, kerf, pieces_tuple):
+    # pieces_tuple holds one (w, h, qty) row per input line; merge repeated sizes
+    counts = Counter()
+    for w, h, qty in pieces_tuple:
+        counts[(w, h)] += qty
+
+    sizes = np.array([(w, h, qty) for (w, h), qty in counts.items()], dtype=np.int64).reshape(-1, 3)
+    qtys = sizes[:, 2]
+    ws = np.repeat(sizes[:, 0] + kerf, qtys)
+    hs = np.repeat(sizes[:, 1] + kerf, qtys)
+    rids = np.repeat(np.arange(len(sizes)), qtys)
+
+    # Whole sheets of the most common size are a plain grid; the guillotine packer fills in
+    # the rest around them
+    (top_w, top_h), top_qty = counts.most_common(1)[0]
+    tiled, free, n_tiled = tile_sheets(top_w + kerf, top_h + kerf, top_qty, sheet_w, sheet_h, MAX_BINS)
+    top_rid = list(counts).index((top_w, top_h))
+    rest = np.ones(len(rids), dtype=bool)
+    rest[np.flatnonzero(rids == top_rid)[:len(tiled)]] = False
+
+    # Each packer and ordering wins on different cut lists and a pack takes about a
+    # millisecond, so try them all and keep whichever needs fewest sheets (earliest on ties).
+    # MaxRects on the whole list is what rectpack ran, so the result is never worse than that.
+    # Ties within an ordering go by height then width so identical sizes stay in one run.
+    candidates = []
+    for primary in (-(ws * hs), -np.maximum(ws, hs), -hs, -ws, -(ws + hs)):
+        order = np.lexsort((-ws, -hs, primary))
+        sub = order[rest[order]]
+        placements, num_sheets = pack_guillotine(ws[sub], hs[sub], sheet_w, sheet_h, MAX_BINS, free, n_tiled)
+        candidates.append((num_sheets, np.concatenate([tiled, placements]),
+                           np.concatenate([np.full(len(tiled), top_rid), rids[sub]])))
+        placements, num_sheets = pack_maxrects(ws[order], hs[order], sheet_w, sheet_h, MAX_BINS)
+        candidates.append((num_sheets, placements, rids[order]))
+    num_sheets, placements, rids = min(candidates, key=lambda c: c[0])
+
+    placed = placements[:, 0] >= 0
+    bins, xs, ys, ws, hs = placements[placed].T
+    rects = Rects(bins, xs, ys, ws - kerf, hs - kerf, rids[placed].astype(np.int32))
+    return rects, num_sheets
+
+
+# === Rendering ===
+def sheet_drawing(sheet_w, sheet_h, rects):
+    # Vector layout for the PDF; no raster step
+    fit = min(6.5 * inch / sheet_w, 8.5 * inch / sheet_h)
+    d = Drawing(sheet_w * fit, sheet_h * fit)
+    d.add(Rect(0, 0, sheet_w * fit, sheet_h * fit, fillColor=HexColor("#f8f8f8"), strokeColor=colors.grey))
+
+    # PDF y runs upwards; flip so the sheet origin stays top-left like the on-screen plot
+    xs, ys = rects.xs * fit, (sheet_h - rects.ys - rects.hs) * fit
+    ws, hs = rects.ws * fit, rects.hs * fit
+    for x, y, w, h in zip(xs.tolist(), ys.tolist(), ws.tolist(), hs.tolist()):
+        d.add(Rect(x, y, w, h, fillColor=HexColor("#ADD8E6"), strokeColor=colors.black, strokeWidth=0.8))
+
+    # Only show label if space is enough; sized and turned like the axes-view labels
+    labelled = (rects.ws > 50) & (rects.hs > 15)
+    cxs, cys = (xs + ws / 2)[labelled], (ys + hs / 2)[labelled]
+    label_ws, label_hs = rects.ws[labelled], rects.hs[labelled]
+    font_sizes = np.clip(np.minimum(label_ws, label_hs) // 10, 6, 9)
+    rotations = np.where(label_ws >= label_hs, 0, 90)
+    for cx, cy, w, h, font_size, rotation in zip(cxs.tolist(), cys.tolist(), label_ws.tolist(),
+                                                 label_hs.tolist(), font_sizes.tolist(), rotations.tolist()):
+        # Baseline a third of the font size below the centre so the text sits centred
+        label = Group(String(0, -font_size / 3, f"{w}×{h}", fontName="Helvetica", fontSize=font_size,
+                             textAnchor="middle"))
+        label.translate(cx, cy)
+        label.rotate(rotation)
+        d.add(label)
+    return d
+
+
+# Label fonts per size (labels use 6-9 pt). Text keeps its own copy of the one it is given,
+# but copying a ready FontProperties is cheaper than building one from rcParams per label.
+_LABEL_FONTS = {size: FontProperties(size=size) for size in range(6, 10)}
+
+
+def axes_figure(sheet_w, sheet_h):
+    # Reused for every sheet of this size: the axes are set up once and only the
+    # panels are swapped.
+    fig = Figure(figsize=(6.5, 9), dpi=PREVIEW_DPI)
+    # Agg canvas attached once; previews are written straight from it with print_png
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    # Fixed margins instead of a tight_layout() pass per sheet
+    fig.subplots_adjust(left=0.12, right=0.97, top=0.95, bottom=0.04)
+    ax.set_autoscale_on(False)
+    ax.set_xlim(0, sheet_w)
+    ax.set_ylim(0, sheet_h)
+    ax.set_aspect('equal')
+    ax.invert_yaxis()
+    ax.set_facecolor("#f8f8f8")
+    return fig, ax
+
+
+def draw_sheet_axes(ax, title, rects, old_artists):
+    # Replace the previous sheet's panels with this one's; returns the new artists
+    for artist in old_artists:
+        artist.remove()
+    ax.set_title(title)
+
+    # Corners of every panel as one (N, 4, 2) vertex array
+    verts = np.empty((len(rects.xs), 4, 2))
+    verts[:, :, 0] = rects.xs[:, None] + rects.ws[:, None] * [0, 1, 1, 0]
+    verts[:, :, 1] = rects.ys[:, None] + rects.hs[:, None] * [0, 0, 1, 1]
+    artists = [ax.add_collection(PolyCollection(verts, facecolors='#ADD8E6', edgecolors='black',
+                                                linewidths=1.2), autolim=False)]
+
+    # Only show label if space is enough; size and orientation computed for all labels at once
+    labelled = (rects.ws > 50) & (rects.hs > 15)
+    ws, hs = rects.ws[labelled], rects.hs[labelled]
+    cxs, cys = rects.xs[labelled] + ws / 2, rects.ys[labelled] + hs / 2
+    font_sizes = np.clip(np.minimum(ws, hs) // 10, 6, 9)
+    rotations = np.where(ws >= hs, 0, 90)
+    for cx, cy, w, h, font_size, rotation in zip(cxs.tolist(), cys.tolist(), ws.tolist(), hs.tolist(),
+                                                 font_sizes.tolist(), rotations.tolist()):
+        artists.append(ax.add_artist(Text(cx, cy, f"{w}×{h}", ha='center', va='center', rotation=rotation,
+                                          fontproperties=_LABEL_FONTS[font_size])))
+    return artists
+
+
+def sheet_figures(pages):
+    # pages: [((sheet_w, sheet_h), title, rects), ...]. Yields a figure with each page drawn;
+    # it is redrawn for the next page, so use it before advancing. One laid-out figure per
+    # sheet size is shared by every page of that size.
+    figures = {}
+    for sheet_wh, title, rects in pages:
+        if sheet_wh not in figures:
+            figures[sheet_wh] = (*axes_figure(*sheet_wh), [])
+        fig, ax, artists = figures[sheet_wh]
+        figures[sheet_wh] = (fig, ax, draw_sheet_axes(ax, title, rects, artists))
+        yield fig
+
+
+def process_code(code, sheet_wh, panel_text, kerf, show_axes):
+    # Runs on a worker thread, so no UI calls in here. Calling the cached pack_panels is fine:
+    # st.cache_data is thread-safe, and with show_spinner=False it never touches the UI.
+    # Returns (code, [(sheet_id, waste_pct, rects, flowable), ...], num_sheets, avg_waste_pct);
+    # the sheet list is None when no valid panels were found. In the axes view the flowable
+    # is None: those pages are drawn by matplotlib in the main thread.
+    sheet_w, sheet_h = sheet_wh
+    pieces = parse_panels(panel_text)
+    if not pieces:
+        return code, None, 0, None
+
+    # Sorted so that reordering the input lines still hits the cache
+    rects, num_sheets = pack_panels(sheet_w, sheet_h, kerf, tuple(sorted(pieces)))
+    if not num_sheets:
+        return code, [], 0, None  # nothing fits the sheet
+    per_bin_used = np.bincount(rects.bins, weights=rects.ws * rects.hs, minlength=num_sheets)
+    waste_pcts = (1 - per_bin_used / (sheet_w * sheet_h)) * 100
+
+    # Group rects by sheet with one sort and split instead of a mask per sheet
+    order = np.argsort(rects.bins, kind="stable")
+    bounds = np.searchsorted(rects.bins[order], np.arange(1, num_sheets))
+    by_sheet = zip(*(np.split(a[order], bounds) for a in rects))
+
+    sheets = []
+    for sheet_id, columns in enumerate(by_sheet):
+        sheet = Rects(*columns)
+        if not len(sheet.xs):
+            continue  # never build a page for an empty bin
+        graphic = None if show_axes else sheet_drawing(sheet_w, sheet_h, sheet)
+        sheets.append((sheet_id, waste_pcts[sheet_id], sheet, graphic))
+
+    return code, sheets, num_sheets, waste_pcts.mean() if num_sheets else None
+
+
+# === Results ===
+def show_tables(errors, df_summary, df_sheets):
+    for error in errors:
+        st.error(error)
+
+    # === Top-Level Sheet Summary ===
+    st.markdown("### 🧾 Orderable Sheets Summary (per Laminate Code)")
+    # Show with left-aligned content
+    st.dataframe(df_summary.style.set_properties(**{'text-align': 'left'}), width="stretch")
+
+    # === Summary Table ===
+    st.markdown("### 📋 Laminate Cutting Summary")
+    st.dataframe(df_sheets, hide_index=True, width="stretch")
+
+
+def show_downloads(pdf_bytes, pages):
+    # === PDF Download ===
+    # on_click="ignore": downloading must not rerun the script and redraw the previews
+    st.download_button("📥 Download PDF", pdf_bytes, file_name="Laminate_Cutting_Plan.pdf",
+                       mime="application/pdf", on_click="ignore")
+
+    # PNG previews are only rasterized while the expander is open; opening it reruns the
+    # script, which is why the last plan is kept in session_state with the inputs behind it
+    previews = st.expander("Preview sheets", key="previews", on_change="rerun")
+    if previews.open:
+        with previews:
+            for fig in sheet_figures(pages):
+                png = io.BytesIO()
+                fig.canvas.print_png(png, pil_kwargs={'compress_level': 1, 'optimize': False})
+                st.image(png.getvalue())
+
 
 # === Inputs ===
 kerf = st.sidebar.number_input("Saw Blade Thickness (Kerf in mm)", value=3, min_value=0)
+show_axes = st.sidebar.checkbox("Show axes and ticks (slower)", value=False)
 num_codes = st.sidebar.number_input("Number of Laminate Codes", value=1, min_value=1, max_value=10)
 
 laminate_inputs = []
@@ -42,281 +263,83 @@ for i in range(num_codes):
     laminate_inputs.append((code, standard_sizes[size_label], panel_text))
 
 # === Process ===
+# Everything the plan depends on; a kept plan is only shown again while these are unchanged
+plan_inputs = (kerf, show_axes, tuple(laminate_inputs))
+results_placeholder = st.empty()
+
 if st.sidebar.button("Generate Cutting Plan"):
     story = []
+    pages = []
     all_sheets = {}
+    avg_waste = {}
     summary_data = []
+    errors = []
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        pdf_path = os.path.join(tmpdir, "Laminate_Cutting_Plan.pdf")
-
-        for code, (sheet_w, sheet_h), panel_text in laminate_inputs:
-            pieces = []
-            for line in panel_text.strip().splitlines():
-                match = re.match(r"\s*(\d+)\s*[xX]\s*(\d+)\s*[xX\s]*(\d*)", line)
-                if match:
-                    w, h = int(match.group(1)), int(match.group(2))
-                    qty = int(match.group(3)) if match.group(3) else 1
-                    for _ in range(qty):
-                        pieces.append((w, h))
-
-            if not pieces:
-                st.error(f"No valid panels found for {code}")
-                continue
-
-            packer = newPacker(mode=1, bin_algo=2, rotation=False)
-            for i, (w, h) in enumerate(pieces):
-                packer.add_rect(w + kerf, h + kerf, rid=i)
-            for _ in range(100):  # Max bins
-                packer.add_bin(sheet_w, sheet_h)
-            packer.pack()
-
-            for sheet_id, abin in enumerate(packer):
-                fig, ax = plt.subplots(figsize=(6.5, 9))
-                ax.set_xlim(0, sheet_w)
-                ax.set_ylim(0, sheet_h)
-                ax.set_title(f"{code} — Sheet {sheet_id + 1}")
-                ax.set_aspect('equal')
-                ax.invert_yaxis()
-                ax.set_facecolor("#f8f8f8")
-
-                used_area = 0
-                for rect in abin:
-                    x, y = rect.x, rect.y
-                    w, h = rect.width - kerf, rect.height - kerf
-                    ax.add_patch(Rectangle((x, y), w, h, edgecolor='black', facecolor='#ADD8E6', lw=1.2))
-
-# Only show label if space is enough
-                    if w > 50 and h > 15:
-                        font_size = max(6, min(9, int(min(w, h) / 10)))
-                        rotation = 0 if w >= h else 90
-                    ax.text(x + w / 2, y + h / 2, f"{int(w)}×{int(h)}", ha='center', va='center', fontsize=font_size, rotation=rotation)
-
-                    used_area += w * h
-
-                total_area = sheet_w * sheet_h
-                waste = total_area - used_area
-                waste_pct = (waste / total_area) * 100 if total_area else 0
-                summary_data.append((code, sheet_id + 1, f"{waste_pct:.2f}%"))
-
-                img_path = os.path.join(tmpdir, f"{code}_sheet_{sheet_id + 1}.png")
-                plt.tight_layout()
-                plt.savefig(img_path, dpi=180)
-                plt.close()
-
-                story.append(Paragraph(f"<b>{code} — Sheet {sheet_id + 1}</b>", styles["Heading3"]))
-                story.append(Paragraph(f"Waste: {waste_pct:.2f}%", styles["Normal"]))
-                story.append(Spacer(1, 6))
-                story.append(RLImage(img_path, width=6.5 * inch, height=8.5 * inch))
-                story.append(Spacer(1, 12))
-
-            all_sheets[code] = len(packer)
-
-        # === PDF Output ===
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-        doc.build(story)
-        # === Top-Level Sheet Summary ===
-        st.markdown("### 🧾 Orderable Sheets Summary (per Laminate Code)")
-        order_summary = {
-            "Laminate Code": list(all_sheets.keys()),
-            "Orderable Sheets": list(all_sheets.values())
-        }
-        # st.table(order_summary)
-        import pandas as pd
-
-        df_summary = pd.DataFrame(order_summary)
-
-        # Show with left-aligned content
-        st.dataframe(df_summary.style.set_properties(**{'text-align': 'left'}), use_container_width=True)
-
-
-
-        # === Summary Table ===
-        st.markdown("### 📋 Laminate Cutting Summary")
-        st.table({
-            "Laminate Code": [code for code, _, _ in summary_data],
-            "Sheet #": [sid for _, sid, _ in summary_data],
-            "Waste %": [waste for _, _, waste in summary_data]
-        })
-
-        # === PDF Download ===
-        with open(pdf_path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="Laminate_Cutting_Plan.pdf">📥 Download PDF</a>'
-            st.markdown(href, unsafe_allow_html=True)
-
-
-
-
-
-# # Laminate Cutting Plan Streamlit App (Selectable Code + Size)
-
-# import streamlit as st
-# import pandas as pd
-# import matplotlib.pyplot as plt
-# from matplotlib.patches import Rectangle
-# from matplotlib.backends.backend_pdf import PdfPages
-# from rectpack import newPacker
-# from collections import defaultdict
-# from io import BytesIO
-# import base64
-# import tempfile
-# import os
-
-# st.set_page_config(layout="wide")
-# st.title("🎨 Laminate Cutting Optimizer")
-# st.sidebar.header("Laminate Inputs")
-
-# kerf = st.sidebar.number_input("Saw Blade Thickness (Kerf in mm)", min_value=0, max_value=10, value=3)
-
-# # === Standard Sheet Sizes ===
-# sheet_options = {
-#     "8x4 ft (1220x2440)": (1220, 2440),
-#     "6x4 ft (1830x1220)": (1220, 1830),
-#     "7x3 ft (2135x915)": (915, 2135)
-# }
-
-# num_laminates = st.sidebar.number_input("Number of Laminate Codes", min_value=1, max_value=5, value=2)
-
-# laminate_config = {}
-# for i in range(num_laminates):
-#     st.sidebar.markdown("---")
-#     code = st.sidebar.text_input(f"Laminate Code {i+1}", key=f"code_{i}")
-#     sheet_size_label = st.sidebar.selectbox(f"Sheet Size for {code or f'Code {i+1}'}", options=list(sheet_options.keys()), key=f"sheet_{i}")
-#     sheet_width, sheet_height = sheet_options[sheet_size_label]
-#     panel_input = st.sidebar.text_area(f"Paste panel sizes for {code or f'Code {i+1}'}", key=f"panels_{i}")
-
-#     if code and panel_input.strip():
-#         panels = defaultdict(int)
-#         for line in panel_input.strip().splitlines():
-#             try:
-#                 w, h = map(int, line.lower().replace("mm", "").replace("×", "x").split("x"))
-#                 panels[(w, h)] += 1
-#             except:
-#                 continue
-#         laminate_config[code] = {
-#             "sheet_width": sheet_width,
-#             "sheet_height": sheet_height,
-#             "pieces": [(w, h, qty) for (w, h), qty in panels.items()]
-#         }
-
-# if not laminate_config:
-#     st.warning("Please enter at least one laminate code and dimensions.")
-#     st.stop()
-
-# # === Process Cutting Plans ===
-# temp_dir = tempfile.TemporaryDirectory()
-# pdf_path = os.path.join(temp_dir.name, "Laminate_Cutting_Plan.pdf")
-# pdf = PdfPages(pdf_path)
-
-# summary_data = []
-# image_buffers = []
-
-# for code, config in laminate_config.items():
-#     sheet_width = config["sheet_width"]
-#     sheet_height = config["sheet_height"]
-#     pieces = config["pieces"]
-
-#     rectangles = []
-#     original_dims = []
-#     for w, h, qty in pieces:
-#         for _ in range(qty):
-#             rid = len(original_dims)
-#             rectangles.append((w + kerf, h + kerf, rid))
-#             original_dims.append((w, h))
-
-#     packer = newPacker(rotation=False)
-#     for w, h, rid in rectangles:
-#         packer.add_rect(w, h, rid)
-#     for _ in range(100):
-#         packer.add_bin(sheet_width, sheet_height)
-#     packer.pack()
-
-#     used_rects = packer.rect_list()
-#     sheets = defaultdict(list)
-#     for bin_id, x, y, w, h, rid in used_rects:
-#         true_w, true_h = w - kerf, h - kerf
-#         ow, oh = original_dims[rid]
-#         sheets[bin_id].append((x, y, true_w, true_h, ow, oh))
-
-#     for sheet_id, rects in sheets.items():
-#         fig, ax = plt.subplots(figsize=(6, 10))
-#         ax.set_xlim(0, sheet_width)
-#         ax.set_ylim(0, sheet_height)
-#         ax.set_aspect('equal')
-#         ax.invert_yaxis()
-#         ax.set_facecolor("#f5f5f5")
-
-#         used_area = 0
-#         for x, y, w, h, ow, oh in rects:
-#             ax.add_patch(Rectangle((x, y), w, h, edgecolor='black', facecolor='#add8e6', lw=1.5))
-#             ax.text(x + w/2, y + h/2, f"{ow}×{oh}", fontsize=8, ha='center', va='center', bbox=dict(facecolor='white', edgecolor='none', pad=1))
-#             used_area += w * h
-
-#         total_area = sheet_width * sheet_height
-#         waste = total_area - used_area
-#         waste_pct = (waste / total_area) * 100
-
-#         ax.set_title(f"{code} — Sheet {sheet_id + 1} | Waste: {waste_pct:.2f}%")
-#         plt.tight_layout()
-
-#         buf = BytesIO()
-#         fig.savefig(buf, format='png', bbox_inches='tight')
-#         pdf.savefig(fig)
-#         plt.close(fig)
-
-#         buf.seek(0)
-#         image_buffers.append((code, sheet_id + 1, waste_pct, buf))
-
-#     summary_data.append({
-#         "Laminate Code": code,
-#         "Total Panels": len(original_dims),
-#         "Total Sheets": len(sheets),
-#         "Orderable Sheets (+5%)": int(len(sheets) * 1.05 + 0.99),
-#         "Waste % (avg)": f"{sum((sheet_width * sheet_height - sum(w * h for _, _, w, h, *_ in s)) / (sheet_width * sheet_height) for s in sheets.values()) / len(sheets):.2f}%" if len(sheets) > 0 else "N/A"
-#     })
-
-# pdf.close()
-
-# # === Display Summary ===
-# st.markdown("## 🧾 Laminate Cutting Summary")
-# st.dataframe(pd.DataFrame(summary_data))
-
-# # === Layouts ===
-# st.markdown("## 📐 Sheet Layouts")
-# for code in laminate_config.keys():
-#     st.markdown(f"### {code}")
-#     scroll_html = '<div style="display:flex;overflow-x:auto;">'
-#     for c, sid, waste, buf in image_buffers:
-#         if c != code:
-#             continue
-#         encoded = base64.b64encode(buf.getvalue()).decode()
-#         scroll_html += f'''
-#             <div style="margin-right:20px;text-align:center;">
-#                 <img src="data:image/png;base64,{encoded}" width="300"><br>
-#                 <b>Sheet {sid} | Waste: {waste:.2f}%</b>
-#             </div>
-#         '''
-#     scroll_html += '</div>'
-#     st.markdown(scroll_html, unsafe_allow_html=True)
-
-# # === Download PDF ===
-# if os.path.exists(pdf_path):
-#     with open(pdf_path, "rb") as f:
-#         b64_pdf = base64.b64encode(f.read()).decode()
-#         href = f'<a href="data:application/octet-stream;base64,{b64_pdf}" download="Laminate_Cutting_Plan.pdf">📥 Download PDF</a>'
-#         st.markdown(href, unsafe_allow_html=True)
-# else:
-#     st.warning("PDF not available. Please check if input was valid.")
-
-
-# st.success("Done! Adjust laminate codes and dimensions to begin.")
-
-
-
-
-
+    # Codes are independent, so pack and render them concurrently (at most 8 threads)
+    with ThreadPoolExecutor(max_workers=min(8, len(laminate_inputs), os.cpu_count() or 1)) as ex:
+        results = list(ex.map(
+            lambda item: process_code(*item, kerf, show_axes), laminate_inputs))
 
+    for (code, sheets, num_sheets, avg_waste_pct), (_, sheet_wh, _) in zip(results, laminate_inputs):
+        if sheets is None:
+            errors.append(f"No valid panels found for {code}")
+            continue
 
+        for sheet_id, waste_pct, sheet, graphic in sheets:
+            summary_data.append((code, sheet_id + 1, f"{waste_pct:.2f}%"))
+            pages.append((sheet_wh, f"{code} — Sheet {sheet_id + 1} | Waste: {waste_pct:.2f}%", sheet))
 
+            if not show_axes:
+                story.append(Paragraph(f"{code} — Sheet {sheet_id + 1}", h3))
+                story.append(Paragraph(f"Waste: {waste_pct:.2f}%", normal))
+                story.append(Spacer(1, 6))
+                story.append(graphic)
+                story.append(Spacer(1, 12))
 
+        all_sheets[code] = num_sheets
+        avg_waste[code] = f"{avg_waste_pct:.2f}%" if avg_waste_pct is not None else "N/A"
+
+    # Waste figures are already known, so the tables go out before the PDF is built
+    df_summary = pd.DataFrame({
+        "Laminate Code": list(all_sheets.keys()),
+        "Orderable Sheets": list(all_sheets.values()),
+        "Waste % (avg)": list(avg_waste.values())
+    })
+    df_sheets = pd.DataFrame(summary_data, columns=["Laminate Code", "Sheet #", "Waste %"])
+
+    output = results_placeholder.container()
+    with output:
+        show_tables(errors, df_summary, df_sheets)
+
+    # === PDF Output ===
+    # Built in memory and handed to st.download_button as bytes
+    pdf_buf = io.BytesIO()
+    if show_axes:
+        # Vector pages straight from the matplotlib figures; no PNG step
+        with PdfPages(pdf_buf) as pdf:
+            title_page = Figure(figsize=(8.27, 11.69))
+            title_page.text(0.08, 0.92, "Laminate Cutting Plan", fontsize=18, weight='bold')
+            for row, code in enumerate(all_sheets):
+                title_page.text(0.08, 0.86 - row * 0.03,
+                                f"{code}: {all_sheets[code]} sheet(s), average waste {avg_waste[code]}",
+                                fontsize=11)
+            pdf.savefig(title_page)
+
+            for fig in sheet_figures(pages):
+                pdf.savefig(fig)
+    else:
+        doc = SimpleDocTemplate(pdf_buf, pagesize=A4)
+        doc.build(story)
+    pdf_bytes = pdf_buf.getvalue()
+
+    st.session_state["plan_inputs"] = plan_inputs
+    st.session_state["plan"] = (errors, df_summary, df_sheets, pdf_bytes, pages)
+    with output:
+        show_downloads(pdf_bytes, pages)
+
+elif st.session_state.get("plan_inputs") == plan_inputs:
+    # Rerun from the preview expander with the same inputs: show the last plan again
+    errors, df_summary, df_sheets, pdf_bytes, pages = st.session_state["plan"]
+    with results_placeholder.container():
+        show_tables(errors, df_summary, df_sheets)
+        show_downloads(pdf_bytes, pages)
@@ -0,0 +1,266 @@
+# Guillotine (Best Area Fit) and MaxRects packers compiled with Numba
+
+from collections import namedtuple
+
+import numpy as np
+from numba import njit
+
+# Placed panels as parallel int32 arrays; ws/hs are the panel sizes without kerf
+Rects = namedtuple("Rects", "bins xs ys ws hs rids")
+
+
+# nogil: laminate codes are packed on worker threads, so let them run in parallel
+@njit(cache=True, nogil=True)
+def _guillotine_baf(ws, hs, sheet_w, sheet_h, max_bins, init_free, init_bins):
+    n = len(ws)
+    # Placements as (bin, x, y, w, h); bin stays -1 for rects that could not be placed
+    out = np.full((n, 5), -1, dtype=np.int32)
+    # Free rects as (bin, x, y, w, h). Each placement consumes one free rect and adds at
+    # most two, each new bin adds one, so this bound is never exceeded. A bin is only
+    # opened for a rect, so at most min(n, remaining bins) new bins need room.
+    n_free = len(init_free)
+    free = np.empty((n_free + n + min(n, max_bins - init_bins) + 1, 5), dtype=np.int32)
+    free[:n_free] = init_free
+    n_bins = init_bins
+
+    for i in range(n):
+        w = ws[i]
+        h = hs[i]
+        if w > sheet_w or h > sheet_h:
+            continue
+
+        # Best Area Fit: the free rect that leaves the least area over
+        best = -1
+        best_score = np.int64(sheet_w) * sheet_h + 1
+        for j in range(n_free):
+            fw = free[j, 3]
+            fh = free[j, 4]
+            if w <= fw and h <= fh:
+                score = np.int64(fw) * fh - np.int64(w) * h
+                if score < best_score:
+                    best_score = score
+                    best = j
+
+        if best == -1:
+            if n_bins == max_bins:
+                continue
+            free[n_free, 0] = n_bins
+            free[n_free, 1] = 0
+            free[n_free, 2] = 0
+            free[n_free, 3] = sheet_w
+            free[n_free, 4] = sheet_h
+            best = n_free
+            n_free += 1
+            n_bins += 1
+
+        b = free[best, 0]
+        fx = free[best, 1]
+        fy = free[best, 2]
+        fw = free[best, 3]
+        fh = free[best, 4]
+        out[i, 0] = b
+        out[i, 1] = fx
+        out[i, 2] = fy
+        out[i, 3] = w
+        out[i, 4] = h
+
+        # Drop the used free rect by moving the last one into its slot
+        n_free -= 1
+        free[best] = free[n_free]
+
+        # Min Area split (rectpack's MINAS rule); it wasted the fewest sheets on
+        # typical cut lists compared with the axis-based rules
+        if (fw - w) * h > w * (fh - h):
+            right_h = h
+            bottom_w = fw
+        else:
+            right_h = fh
+            bottom_w = w
+        if fw - w > 0 and right_h > 0:
+            free[n_free, 0] = b
+            free[n_free, 1] = fx + w
+            free[n_free, 2] = fy
+            free[n_free, 3] = fw - w
+            free[n_free, 4] = right_h
+            n_free += 1
+        if fh - h > 0 and bottom_w > 0:
+            free[n_free, 0] = b
+            free[n_free, 1] = fx
+            free[n_free, 2] = fy + h
+            free[n_free, 3] = bottom_w
+            free[n_free, 4] = fh - h
+            n_free += 1
+
+    return out, n_bins
+
+
+# The algorithm rectpack's newPacker(mode=1, bin_algo=2, rotation=False) ran: MaxRects with
+# Best Short Side Fit, each rect going to whichever open bin fits it best. Same placements
+# as rectpack for the same input order.
+@njit(cache=True, nogil=True)
+def _maxrects_bssf(ws, hs, sheet_w, sheet_h, max_bins):
+    n = len(ws)
+    out = np.full((n, 5), -1, dtype=np.int32)
+    # Maximal free rects per bin as (x, y, w, h); the second axis grows when a bin needs more
+    free = np.empty((max_bins, 64, 4), dtype=np.int32)
+    n_free = np.zeros(max_bins, dtype=np.int64)
+    n_bins = 0
+
+    for i in range(n):
+        w = ws[i]
+        h = hs[i]
+        if w > sheet_w or h > sheet_h:
+            continue
+
+        # Best Short Side Fit over every open bin; the first one wins ties, as in rectpack
+        best_b = -1
+        best_k = -1
+        best_score = sheet_w + sheet_h
+        for b in range(n_bins):
+            for k in range(n_free[b]):
+                fw = free[b, k, 2]
+                fh = free[b, k, 3]
+                if w <= fw and h <= fh:
+                    score = min(fw - w, fh - h)
+                    if score < best_score:
+                        best_score = score
+                        best_b = b
+                        best_k = k
+
+        if best_b == -1:
+            if n_bins == max_bins:
+                continue
+            best_b = n_bins
+            best_k = 0
+            free[best_b, 0, 0] = 0
+            free[best_b, 0, 1] = 0
+            free[best_b, 0, 2] = sheet_w
+            free[best_b, 0, 3] = sheet_h
+            n_free[best_b] = 1
+            n_bins += 1
+
+        b = best_b
+        x = free[b, best_k, 0]
+        y = free[b, best_k, 1]
+        out[i, 0] = b
+        out[i, 1] = x
+        out[i, 2] = y
+        out[i, 3] = w
+        out[i, 4] = h
+
+        # Every free rect the panel overlaps is replaced by the up to four strips around it
+        m = n_free[b]
+        split = np.empty((4 * m, 4), dtype=np.int32)
+        cnt = 0
+        for k in range(m):
+            fx = free[b, k, 0]
+            fy = free[b, k, 1]
+            fw = free[b, k, 2]
+            fh = free[b, k, 3]
+            if fx >= x + w or fx + fw <= x or fy >= y + h or fy + fh <= y:
+                split[cnt] = free[b, k]
+                cnt += 1
+                continue
+            if x > fx:
+                split[cnt, 0] = fx
+                split[cnt, 1] = fy
+                split[cnt, 2] = x - fx
+                split[cnt, 3] = fh
+                cnt += 1
+            if x + w < fx + fw:
+                split[cnt, 0] = x + w
+                split[cnt, 1] = fy
+                split[cnt, 2] = fx + fw - x - w
+                split[cnt, 3] = fh
+                cnt += 1
+            if y + h < fy + fh:
+                split[cnt, 0] = fx
+                split[cnt, 1] = y + h
+                split[cnt, 2] = fw
+                split[cnt, 3] = fy + fh - y - h
+                cnt += 1
+            if y > fy:
+                split[cnt, 0] = fx
+                split[cnt, 1] = fy
+                split[cnt, 2] = fw
+                split[cnt, 3] = y - fy
+                cnt += 1
+
+        # Drop free rects that sit inside another one
+        dead = np.zeros(cnt, dtype=np.bool_)
+        for p in range(cnt):
+            for q in range(p + 1, cnt):
+                px, py, pw, ph = split[p, 0], split[p, 1], split[p, 2], split[p, 3]
+                qx, qy, qw, qh = split[q, 0], split[q, 1], split[q, 2], split[q, 3]
+                if qx >= px and qy >= py and qx + qw <= px + pw and qy + qh <= py + ph:
+                    dead[q] = True
+                elif px >= qx and py >= qy and px + pw <= qx + qw and py + ph <= qy + qh:
+                    dead[p] = True
+        # rectpack removes contained rects by value, so identical copies all go together
+        for p in range(cnt):
+            if dead[p]:
+                for q in range(cnt):
+                    if (split[q, 0] == split[p, 0] and split[q, 1] == split[p, 1]
+                            and split[q, 2] == split[p, 2] and split[q, 3] == split[p, 3]):
+                        dead[q] = True
+
+        kept = cnt - dead.sum()
+        if kept > free.shape[1]:
+            grown = np.empty((max_bins, 2 * kept, 4), dtype=np.int32)
+            for bb in range(n_bins):
+                grown[bb, :n_free[bb]] = free[bb, :n_free[bb]]
+            free = grown
+        k = 0
+        for p in range(cnt):
+            if not dead[p]:
+                free[b, k] = split[p]
+                k += 1
+        n_free[b] = k
+
+    return out, n_bins
+
+
+def pack_guillotine(ws, hs, sheet_w, sheet_h, max_bins, free=None, n_bins=0):
+    # Rects are placed in the order given; returns ((n, 5) placements, bins used).
+    # free/n_bins seed the packer with bins that are already partly used (see tile_sheets).
+    if free is None:
+        free = np.empty((0, 5), dtype=np.int32)
+    return _guillotine_baf(np.ascontiguousarray(ws, dtype=np.int32),
+                           np.ascontiguousarray(hs, dtype=np.int32),
+                           int(sheet_w), int(sheet_h), int(max_bins),
+                           np.ascontiguousarray(free, dtype=np.int32), int(n_bins))
+
+
+def pack_maxrects(ws, hs, sheet_w, sheet_h, max_bins):
+    # Rects are placed in the order given; returns ((n, 5) placements, bins used)
+    return _maxrects_bssf(np.ascontiguousarray(ws, dtype=np.int32),
+                          np.ascontiguousarray(hs, dtype=np.int32),
+                          int(sheet_w), int(sheet_h), int(max_bins))
+
+
+def tile_sheets(w, h, count, sheet_w, sheet_h, max_bins, min_fill=0.9):
+    # Fill whole sheets with a grid of one size. Returns ((n, 5) placements, free rects
+    # left on those sheets, sheets used); rects that don't fill a sheet are left to the packer.
+    # Sparse grids (under min_fill of the sheet) are skipped: the packer mixes sizes into
+    # those sheets better than a fixed grid plus offcuts does.
+    cols, rows = sheet_w // w, sheet_h // h
+    per_sheet = cols * rows
+    dense = per_sheet * w * h >= min_fill * sheet_w * sheet_h
+    n_sheets = min(count // per_sheet, max_bins) if dense else 0
+
+    gx, gy = np.meshgrid(np.arange(cols) * w, np.arange(rows) * h)
+    placements = np.empty((n_sheets * per_sheet, 5), dtype=np.int32)
+    placements[:, 0] = np.repeat(np.arange(n_sheets), per_sheet)
+    placements[:, 1] = np.tile(gx.ravel(), n_sheets)
+    placements[:, 2] = np.tile(gy.ravel(), n_sheets)
+    placements[:, 3] = w
+    placements[:, 4] = h
+
+    # Offcuts of each tiled sheet, split guillotine-style: full-height strip on the right,
+    # strip below the grid
+    offcuts = [(cols * w, 0, sheet_w - cols * w, sheet_h), (0, rows * h, cols * w, sheet_h - rows * h)]
+    offcuts = np.array([o for o in offcuts if o[2] > 0 and o[3] > 0], dtype=np.int32).reshape(-1, 4)
+    free = np.empty((n_sheets * len(offcuts), 5), dtype=np.int32)
+    free[:, 0] = np.repeat(np.arange(n_sheets), len(offcuts))
+    free[:, 1:] = np.tile(offcuts, (n_sheets, 1))
+    return placements, free, n_sheets
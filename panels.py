@@ -0,0 +1,44 @@
+# Panel list parsing for the cut-list text areas
+
+# Separators become spaces and "mm" units are dropped, in one C-level pass over the text
+_PANEL_XLATE = str.maketrans({"x": " ", "X": " ", "×": " ", "m": None, "M": None})
+
+
+def _leading_int(token):
+    # Value of the digits a token starts with ("2pcs" -> 2, "2," -> 2), or None. A number that
+    # carries on past "," "." or "/" ("1,200", "450.5", "12/06") raises ValueError: its first
+    # digits alone would give the wrong size.
+    rest = token.lstrip("0123456789")
+    digits = len(token) - len(rest)
+    if not digits:
+        return None
+    if rest[:1] in (",", ".", "/") and rest[1:2].isdigit():
+        raise ValueError(f"not a whole number: {token}")
+    return int(token[:digits])
+
+
+def parse_panels(panel_text):
+    # One panel per line: "W x H" with an optional quantity, e.g. "450x600x2", "300 x 1200 x 3"
+    # or "450mm x 600mm". Anything after the numbers ("2pcs", "# kitchen", "(2)") is ignored;
+    # lines that don't start with two whole numbers are skipped.
+    pieces = []
+    # translate() leaves line breaks alone, so raw and normalised lines pair up one to one
+    for raw, line in zip(panel_text.splitlines(), panel_text.translate(_PANEL_XLATE).splitlines()):
+        if not raw.lstrip()[:1].isdigit():
+            continue  # e.g. "x600x2": a separator where the width should be
+        nums = []
+        try:
+            for part in line.split()[:3]:
+                num = _leading_int(part)
+                if num is None:
+                    break
+                nums.append(num)
+        except ValueError:
+            continue
+        if len(nums) < 2:
+            continue
+        w, h = nums[0], nums[1]
+        qty = nums[2] if len(nums) > 2 else 1
+        if w > 0 and h > 0 and qty > 0:
+            pieces.append((w, h, qty))
+    return pieces
@@ -0,0 +1,91 @@
+# Checks for the Numba packers: run with `python -m pytest`
+
+import numpy as np
+import pytest
+
+from packer import pack_guillotine, pack_maxrects, tile_sheets
+
+SHEET_W, SHEET_H = 1220, 2440
+
+
+def cut_lists(seed, n=40):
+    # Random cut lists as expanded (ws, hs) arrays, some with panels too big for the sheet
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        k = rng.integers(1, 10)
+        qtys = rng.integers(1, 20, k)
+        yield (np.repeat(rng.integers(20, 1300, k), qtys).astype(np.int32),
+               np.repeat(rng.integers(20, 2600, k), qtys).astype(np.int32))
+
+
+def check_layout(placements, n_bins, ws, hs, max_bins):
+    placed = placements[:, 0] >= 0
+    bins, xs, ys, pw, ph = placements[placed].T
+
+    # Sizes are kept, every panel is inside its sheet and on a sheet that was counted
+    assert (pw == ws[placed]).all() and (ph == hs[placed]).all()
+    assert (xs >= 0).all() and (ys >= 0).all()
+    assert (xs + pw <= SHEET_W).all() and (ys + ph <= SHEET_H).all()
+    assert (bins < n_bins).all() and n_bins <= max_bins
+
+    # No two panels on a sheet overlap
+    for b in range(n_bins):
+        m = bins == b
+        x, y, w, h = xs[m], ys[m], pw[m], ph[m]
+        overlap = ((x[:, None] < x + w) & (x < x[:, None] + w[:, None])
+                   & (y[:, None] < y + h) & (y < y[:, None] + h[:, None]))
+        np.fill_diagonal(overlap, False)
+        assert not overlap.any()
+
+    # Every panel that fits the sheet is placed while sheets are left
+    fits = (ws <= SHEET_W) & (hs <= SHEET_H)
+    assert not placed[~fits].any()
+    if n_bins < max_bins:
+        assert placed[fits].all()
+
+
+@pytest.mark.parametrize("max_bins", [100, 3])
+def test_guillotine_layout(max_bins):
+    for ws, hs in cut_lists(1):
+        placements, n_bins = pack_guillotine(ws, hs, SHEET_W, SHEET_H, max_bins)
+        check_layout(placements, n_bins, ws, hs, max_bins)
+
+
+@pytest.mark.parametrize("max_bins", [100, 3])
+def test_maxrects_layout(max_bins):
+    for ws, hs in cut_lists(2):
+        placements, n_bins = pack_maxrects(ws, hs, SHEET_W, SHEET_H, max_bins)
+        check_layout(placements, n_bins, ws, hs, max_bins)
+
+
+def test_guillotine_around_tiled_sheets():
+    rng = np.random.default_rng(3)
+    for _ in range(40):
+        w, h, count = int(rng.integers(100, 700)), int(rng.integers(100, 1300)), int(rng.integers(1, 80))
+        tiled, free, n_tiled = tile_sheets(w, h, count, SHEET_W, SHEET_H, 100, min_fill=0.5)
+        assert len(tiled) <= count
+        ws = np.concatenate([np.full(count - len(tiled), w), rng.integers(50, 900, 15)]).astype(np.int32)
+        hs = np.concatenate([np.full(count - len(tiled), h), rng.integers(50, 1800, 15)]).astype(np.int32)
+        placements, n_bins = pack_guillotine(ws, hs, SHEET_W, SHEET_H, 100, free, n_tiled)
+        check_layout(np.concatenate([tiled, placements]), n_bins,
+                     np.concatenate([tiled[:, 3], ws]), np.concatenate([tiled[:, 4], hs]), 100)
+
+
+def test_maxrects_matches_rectpack():
+    # pack_maxrects stands in for rectpack's default packer, so the layouts must agree
+    rectpack = pytest.importorskip("rectpack")
+    for ws, hs in cut_lists(4, n=20):
+        packer = rectpack.newPacker(mode=1, bin_algo=2, rotation=False)
+        for rid, (w, h) in enumerate(zip(ws.tolist(), hs.tolist())):
+            packer.add_rect(w, h, rid=rid)
+        for _ in range(100):
+            packer.add_bin(SHEET_W, SHEET_H)
+        packer.pack()
+        expected = sorted((b, r.x, r.y, r.width, r.height, r.rid) for b, abin in enumerate(packer) for r in abin)
+
+        # rectpack packs largest area first, keeping input order on ties
+        order = np.argsort(-(ws.astype(np.int64) * hs), kind="stable")
+        placements, n_bins = pack_maxrects(ws[order], hs[order], SHEET_W, SHEET_H, 100)
+        got = sorted((*p, rid) for p, rid in zip(placements.tolist(), order.tolist()) if p[0] >= 0)
+        assert n_bins == len(packer)
+        assert got == expected
@@ -0,0 +1,46 @@
+# Checks for the cut-list parser: run with `python -m pytest`
+
+import pytest
+
+from panels import parse_panels
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("450x600x2", [(450, 600, 2)]),
+    ("300 x 1200 x 3", [(300, 1200, 3)]),
+    ("450 X 600 X 4", [(450, 600, 4)]),
+    ("450x600", [(450, 600, 1)]),
+    ("  450x600x3  ", [(450, 600, 3)]),
+    ("450mm x 600mm", [(450, 600, 1)]),
+    ("450×600×2", [(450, 600, 2)]),
+    # Trailing text after the numbers is ignored, as the old regex did
+    ("450x600x2pcs", [(450, 600, 2)]),
+    ("450x600x2,", [(450, 600, 2)]),
+    ("450x600  # kitchen", [(450, 600, 1)]),
+    ("450x600 (2)", [(450, 600, 1)]),
+    ("450x600-2", [(450, 600, 1)]),
+])
+def test_parses(line, expected):
+    assert parse_panels(line) == expected
+
+
+@pytest.mark.parametrize("line", [
+    "abc",
+    "450x",
+    "x600x2",
+    "0x600",
+    "450x600x0",
+    # Numbers that go on past , . or / would be cut short, so the line is skipped
+    "1,200x600x2",
+    "2,440 x 1,220",
+    "12/06 450x600",
+    "450.5x600",
+    "450x600x2.5",
+])
+def test_skips(line):
+    assert parse_panels(line) == []
+
+
+def test_one_panel_per_line():
+    text = "450x600x2\nnotes\n\n300 x 1200 x 3\r\n750x400x4"
+    assert parse_panels(text) == [(450, 600, 2), (300, 1200, 3), (750, 400, 4)]